@@ -0,0 +1,207 @@
+"""
+Incrementally maintained performance analytics.
+
+record_submission() folds each submission into materialized counters as it is
+saved, so the dashboards read a handful of pre-aggregated rows instead of
+re-reading every submission. Counters live in a small SQLite file next to the
+submission archive; class-wide totals are kept under the user id "*", which
+the API refuses as a real user id.
+Each submission is folded in at most once (tracked by its archive filename), so
+rebuild() can run while the server keeps accepting submissions.
+"""
+
+import os
+import sqlite3
+import threading
+from datetime import date, timedelta
+
+from backend.submission_store import SUBMISSIONS_DIR, archive, grade_answers
+
+ANALYTICS_DB = os.path.join(SUBMISSIONS_DIR, "analytics.sqlite")
+CLASS_ID = "*"
+TREND_DAYS = 30
+
+_SCHEMA = """
+CREATE TABLE IF NOT EXISTS applied (
+    filename TEXT PRIMARY KEY
+);
+CREATE TABLE IF NOT EXISTS counters (
+    user_id TEXT NOT NULL,
+    dimension TEXT NOT NULL,  -- overall, subject, topic, difficulty
+    key TEXT NOT NULL,
+    correct INTEGER NOT NULL DEFAULT 0,
+    total INTEGER NOT NULL DEFAULT 0,
+    PRIMARY KEY (user_id, dimension, key)
+);
+CREATE TABLE IF NOT EXISTS daily (
+    user_id TEXT NOT NULL,
+    day TEXT NOT NULL,
+    exams INTEGER NOT NULL DEFAULT 0,
+    correct INTEGER NOT NULL DEFAULT 0,
+    total INTEGER NOT NULL DEFAULT 0,
+    PRIMARY KEY (user_id, day)
+);
+CREATE TABLE IF NOT EXISTS streaks (
+    user_id TEXT PRIMARY KEY,
+    last_day TEXT,
+    day_streak INTEGER NOT NULL DEFAULT 0,
+    best_day_streak INTEGER NOT NULL DEFAULT 0,
+    answer_streak INTEGER NOT NULL DEFAULT 0,
+    best_answer_streak INTEGER NOT NULL DEFAULT 0
+);
+"""
+
+_local = threading.local()
+
+
+def _connection():
+    conn = getattr(_local, "conn", None)
+    if conn is None:
+        os.makedirs(os.path.dirname(ANALYTICS_DB), exist_ok=True)
+        # IMMEDIATE so concurrent workers serialize their read-modify-write of streaks
+        conn = _local.conn = sqlite3.connect(ANALYTICS_DB, timeout=30, isolation_level="IMMEDIATE")
+        conn.execute("PRAGMA journal_mode=WAL")
+        conn.executescript(_SCHEMA)
+    return conn
+
+
+def _label(q, *keys):
+    for key in keys:
+        value = q.get(key)
+        if value:
+            return str(value)
+    return "Unknown"
+
+
+def _bump_counter(conn, user_id, dimension, key, correct):
+    conn.execute(
+        "INSERT INTO counters (user_id, dimension, key, correct, total) VALUES (?, ?, ?, ?, 1) "
+        "ON CONFLICT (user_id, dimension, key) DO UPDATE SET correct = correct + excluded.correct, total = total + 1",
+        (user_id, dimension, key, int(correct))
+    )
+
+
+def _update_streaks(conn, user_id, day, results):
+    row = conn.execute(
+        "SELECT last_day, day_streak, best_day_streak, answer_streak, best_answer_streak FROM streaks WHERE user_id = ?",
+        (user_id,)
+    ).fetchone()
+    last_day, day_streak, best_day, answer_streak, best_answer = row or (None, 0, 0, 0, 0)
+    if last_day != day:
+        # Submissions arrive in time order, so a gap of exactly one day extends the streak
+        if last_day and date.fromisoformat(last_day) + timedelta(days=1) == date.fromisoformat(day):
+            day_streak += 1
+        else:
+            day_streak = 1
+        last_day = day
+    for is_correct in results:
+        answer_streak = answer_streak + 1 if is_correct else 0
+        best_answer = max(best_answer, answer_streak)
+    conn.execute(
+        "INSERT OR REPLACE INTO streaks VALUES (?, ?, ?, ?, ?, ?)",
+        (user_id, last_day, day_streak, max(best_day, day_streak), answer_streak, best_answer)
+    )
+
+
+def _fold(conn, filename, user_id, questions, results, submitted_at):
+    # Must run inside a transaction; skips submissions that were already counted
+    if conn.execute("INSERT OR IGNORE INTO applied (filename) VALUES (?)", (filename,)).rowcount == 0:
+        return
+    day = submitted_at[:10]
+    # A stray "*" submission (e.g. from an old archive) counts once, in the class totals only
+    user_ids = (CLASS_ID,) if user_id == CLASS_ID else (user_id, CLASS_ID)
+    for q, is_correct in zip(questions, results):
+        labels = (
+            ("overall", "all"),
+            ("subject", _label(q, "subject")),
+            ("topic", _label(q, "topic", "Topic")),
+            ("difficulty", _label(q, "difficulty", "Difficulty").capitalize()),
+        )
+        for uid in user_ids:
+            for dimension, key in labels:
+                _bump_counter(conn, uid, dimension, key, is_correct)
+    for uid in user_ids:
+        conn.execute(
+            "INSERT INTO daily (user_id, day, exams, correct, total) VALUES (?, ?, 1, ?, ?) "
+            "ON CONFLICT (user_id, day) DO UPDATE SET exams = exams + 1, "
+            "correct = correct + excluded.correct, total = total + excluded.total",
+            (uid, day, sum(results), len(results))
+        )
+    if user_id != CLASS_ID:
+        _update_streaks(conn, user_id, day, results)
+
+
+def record_submission(filename, user_id, questions, results, submitted_at):
+    """
+    Folds one scored submission into the user's and the class-wide counters.
+    results holds the per-question correctness computed by grade_answers() when
+    the submission was scored; submitted_at uses the archive's
+    "%Y-%m-%d %H:%M:%S" format.
+    """
+    conn = _connection()
+    with conn:
+        _fold(conn, filename, user_id, questions, results, submitted_at)
+
+
+def get_summary(user_id=CLASS_ID):
+    """
+    Returns accuracy per dimension, the daily trend for the last TREND_DAYS days
+    and (for a single user) streaks, all read from the materialized tables.
+    """
+    conn = _connection()
+    summary = {"overall": None, "subject": {}, "topic": {}, "difficulty": {}}
+    rows = conn.execute("SELECT dimension, key, correct, total FROM counters WHERE user_id = ?", (user_id,))
+    for dimension, key, correct, total in rows:
+        stats = {"correct": correct, "total": total, "accuracy": correct / total if total else 0}
+        if dimension == "overall":
+            summary["overall"] = stats
+        else:
+            summary[dimension][key] = stats
+    since = (date.today() - timedelta(days=TREND_DAYS)).isoformat()
+    summary["trend"] = [
+        {"day": day, "exams": exams, "correct": correct, "total": total, "accuracy": correct / total if total else 0}
+        for day, exams, correct, total in conn.execute(
+            "SELECT day, exams, correct, total FROM daily WHERE user_id = ? AND day >= ? ORDER BY day",
+            (user_id, since)
+        )
+    ]
+    if user_id != CLASS_ID:
+        row = conn.execute(
+            "SELECT last_day, day_streak, best_day_streak, answer_streak, best_answer_streak FROM streaks WHERE user_id = ?",
+            (user_id,)
+        ).fetchone()
+        last_day, day_streak, best_day, answer_streak, best_answer = row or (None, 0, 0, 0, 0)
+        summary["streaks"] = {
+            "last_active_day": last_day,
+            "days": day_streak,
+            "best_days": best_day,
+            "correct_answers": answer_streak,
+            "best_correct_answers": best_answer,
+        }
+    return summary
+
+
+def rebuild():
+    """
+    Recomputes every counter from the archived submissions, e.g. after
+    migrate_submissions.py or when the analytics file is lost.
+
+    Runs as one IMMEDIATE transaction: submit_answers calls block until it
+    commits, and the archive is read only after the write lock is held, so a
+    concurrent submission is either part of the rebuild or folded in after it,
+    never both.
+    """
+    conn = _connection()
+    with conn:
+        for table in ("counters", "daily", "streaks", "applied"):
+            conn.execute(f"DELETE FROM {table}")
+        submissions = [(filename, archive.load(filename)) for filename in archive.filenames()]
+        submissions = [(filename, sub) for filename, sub in submissions if sub["submitted_at"]]
+        for filename, sub in sorted(submissions, key=lambda item: item[1]["submitted_at"]):
+            results = grade_answers(sub["questions"], sub["answers"])
+            _fold(conn, filename, sub["user_id"], sub["questions"], results, sub["submitted_at"])
+
+
+if __name__ == "__main__":
+    rebuild()
+    print(f"Rebuilt analytics in {ANALYTICS_DB}")
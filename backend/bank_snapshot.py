@@ -0,0 +1,286 @@
+"""
+Prebuilt, memory-mappable snapshot of the question banks.
+
+build_bank_snapshot.py writes every bank table into one versioned binary file:
+a JSON header followed by array-backed columns (uint32 offsets + UTF-8 blob for
+text, float64/int64 arrays for numbers, a uint8 null mask for each) and uint32
+row-id indexes per difficulty. Workers mmap the file read-only, so they all
+share one copy in the page cache, and sampled exam reads (question_bank.fetch_rows
+with sample=k) never touch SQLite. Each source
+bank is fingerprinted; tables whose bank changed since the build are ignored
+and served from SQLite instead.
+
+Layout: MAGIC | <II version, header length | header JSON | padding to 8 | data.
+All offsets in the header are relative to the start of the data section.
+"""
+
+import hashlib
+import json
+import mmap
+import threading
+from bisect import bisect_right
+import os
+import random
+import struct
+import sys
+from array import array
+
+MAGIC = b"QBSNAP\x00\x00"
+VERSION = 1
+_PREAMBLE = struct.Struct("<II")
+_ALIGN = 8
+
+
+def file_checksum(path):
+    h = hashlib.blake2b(digest_size=16)
+    with open(path, "rb") as f:
+        for chunk in iter(lambda: f.read(1 << 20), b""):
+            h.update(chunk)
+    return h.hexdigest()
+
+
+def fingerprint(path):
+    st = os.stat(path)
+    return {"size": st.st_size, "mtime_ns": st.st_mtime_ns, "checksum": file_checksum(path)}
+
+
+def is_fresh(path, expected):
+    """
+    True if the bank at path still matches the fingerprint recorded at build time.
+    Size and mtime are checked first; the checksum is only computed when the
+    mtime moved (e.g. after a git checkout) to tell real changes apart.
+    """
+    try:
+        st = os.stat(path)
+    except OSError:
+        return False
+    if st.st_size != expected["size"]:
+        return False
+    if st.st_mtime_ns == expected["mtime_ns"]:
+        return True
+    return file_checksum(path) == expected["checksum"]
+
+
+# --- Building ---
+
+def _column_kind(values):
+    kinds = {type(v) for v in values if v is not None}
+    if kinds <= {str}:
+        return "text"
+    if kinds <= {int}:
+        return "int"
+    if kinds <= {int, float}:
+        return "real"
+    # Mixed storage classes; keep exact values via JSON
+    return "json"
+
+
+class _Writer:
+    def __init__(self):
+        self.chunks = []
+        self.size = 0
+
+    def add(self, data):
+        pad = -self.size % _ALIGN
+        if pad:
+            self.chunks.append(b"\x00" * pad)
+            self.size += pad
+        offset = self.size
+        data = bytes(data)
+        self.chunks.append(data)
+        self.size += len(data)
+        return offset
+
+
+def _encode_column(writer, values, kind):
+    spec = {"kind": kind, "nulls": writer.add(array("B", (v is None for v in values)).tobytes())}
+    if kind in ("text", "json"):
+        offsets = array("I", [0])
+        blob = bytearray()
+        for v in values:
+            if v is not None:
+                blob += (v if kind == "text" else json.dumps(v)).encode("utf-8")
+            offsets.append(len(blob))
+        spec["offsets"] = writer.add(offsets.tobytes())
+        spec["data"] = writer.add(blob)
+    else:
+        typecode = "q" if kind == "int" else "d"
+        spec["values"] = writer.add(array(typecode, (0 if v is None else v for v in values)).tobytes())
+    return spec
+
+
+def build_snapshot(path, tables):
+    """
+    Writes a snapshot to path. tables is a list of
+    (subject, grade, db_path, table, columns, rows) with rows as tuples in column order.
+    """
+    writer = _Writer()
+    header = {"version": VERSION, "tables": []}
+    for subject, grade, db_path, table, columns, rows in tables:
+        entry = {
+            "subject": subject,
+            "grade": grade,
+            "db_path": db_path,
+            "table": table,
+            "source": fingerprint(db_path),
+            "rows": len(rows),
+            "columns": [],
+            "difficulty_index": {},
+        }
+        for i, name in enumerate(columns):
+            values = [row[i] for row in rows]
+            spec = _encode_column(writer, values, _column_kind(values))
+            spec["name"] = name
+            entry["columns"].append(spec)
+        if "Difficulty" in columns:
+            by_difficulty = {}
+            col = columns.index("Difficulty")
+            for row_id, row in enumerate(rows):
+                by_difficulty.setdefault(row[col], array("I")).append(row_id)
+            for value, ids in by_difficulty.items():
+                if value is not None:
+                    entry["difficulty_index"][value] = {"offset": writer.add(ids.tobytes()), "count": len(ids)}
+        header["tables"].append(entry)
+    header_bytes = json.dumps(header).encode("utf-8")
+    prefix = MAGIC + _PREAMBLE.pack(VERSION, len(header_bytes)) + header_bytes
+    prefix += b"\x00" * (-len(prefix) % _ALIGN)
+    tmp_path = path + ".tmp"
+    with open(tmp_path, "wb") as f:
+        f.write(prefix)
+        for chunk in writer.chunks:
+            f.write(chunk)
+    # Atomic swap so running workers never map a half-written file
+    os.replace(tmp_path, path)
+
+
+# --- Reading ---
+
+class _Table:
+    def __init__(self, view, entry):
+        self.rows = entry["rows"]
+        self.columns = []
+        for spec in entry["columns"]:
+            n = self.rows
+            nulls = view[spec["nulls"]:spec["nulls"] + n]
+            if spec["kind"] in ("text", "json"):
+                offsets = view[spec["offsets"]:spec["offsets"] + 4 * (n + 1)].cast("I")
+                data = view[spec["data"]:spec["data"] + offsets[n]]
+                self.columns.append((spec["name"], spec["kind"], nulls, offsets, data))
+            else:
+                typecode = "q" if spec["kind"] == "int" else "d"
+                values = view[spec["values"]:spec["values"] + 8 * n].cast(typecode)
+                self.columns.append((spec["name"], spec["kind"], nulls, values, None))
+        self.difficulty_index = {
+            value: view[ix["offset"]:ix["offset"] + 4 * ix["count"]].cast("I")
+            for value, ix in entry["difficulty_index"].items()
+        }
+        self._by_name = {c[0]: c for c in self.columns}
+        self._folded = {}
+        self._folded_lock = threading.Lock()
+
+    def _folded_column(self, name, offsets, data):
+        # ASCII-lowercased copy of a text column's blob plus its offsets as a list,
+        # made once per process for the columns that get searched (only Topic)
+        folded = self._folded.get(name)
+        if folded is None:
+            with self._folded_lock:
+                folded = self._folded.get(name)
+                if folded is None:
+                    folded = self._folded[name] = (data.tobytes().lower(), offsets.tolist())
+        return folded
+
+    def matching(self, row_ids, column, needle):
+        """
+        Filters row ids to those whose text column contains needle, comparing the
+        raw UTF-8 bytes with ASCII-only case folding, like SQLite's LIKE. No row
+        dicts are built.
+        """
+        spec = self._by_name.get(column)
+        if spec is None or spec[1] != "text":
+            return []
+        _, _, nulls, offsets, data = spec
+        blob, bounds = self._folded_column(column, offsets, data)
+        needle = needle.encode("utf-8").lower()
+        # One pass over the whole column: map each occurrence back to its row and
+        # keep it if the match doesn't run into the next row's value
+        hits = set()
+        pos = blob.find(needle)
+        while pos != -1:
+            i = bisect_right(bounds, pos) - 1
+            if pos + len(needle) <= bounds[i + 1]:
+                hits.add(i)
+            pos = blob.find(needle, pos + 1)
+        return [i for i in row_ids if i in hits and not nulls[i]]
+
+    def row(self, row_id):
+        q = {}
+        for name, kind, nulls, values, data in self.columns:
+            if nulls[row_id]:
+                q[name] = None
+            elif data is None:
+                q[name] = values[row_id]
+            else:
+                text = str(data[values[row_id]:values[row_id + 1]], "utf-8")
+                q[name] = text if kind == "text" else json.loads(text)
+        return q
+
+
+class BankSnapshot:
+    """
+    Read-only view of a snapshot file. Only tables whose source bank is unchanged
+    since the build are exposed.
+    """
+
+    def __init__(self, path):
+        with open(path, "rb") as f:
+            self._mmap = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+        if self._mmap[:len(MAGIC)] != MAGIC:
+            raise ValueError(f"{path} is not a question bank snapshot")
+        version, header_len = _PREAMBLE.unpack_from(self._mmap, len(MAGIC))
+        if version != VERSION:
+            raise ValueError(f"{path} has snapshot version {version}, expected {VERSION}")
+        start = len(MAGIC) + _PREAMBLE.size
+        header = json.loads(self._mmap[start:start + header_len])
+        data_start = start + header_len + (-(start + header_len) % _ALIGN)
+        view = memoryview(self._mmap)[data_start:]
+        self.tables = {}
+        self.stale = []
+        for entry in header["tables"]:
+            key = (entry["db_path"], entry["table"])
+            if is_fresh(entry["db_path"], entry["source"]):
+                self.tables[key] = _Table(view, entry)
+            else:
+                self.stale.append(key)
+
+    def has(self, db_path, table):
+        return (db_path, table) in self.tables
+
+    def fetch_rows(self, db_path, table, difficulty=None, topic=None, sample=None):
+        """
+        Same contract as question_bank.fetch_rows: filters on the column arrays
+        first and only builds dicts for the rows returned.
+        """
+        t = self.tables[(db_path, table)]
+        if difficulty:
+            row_ids = t.difficulty_index.get(difficulty.capitalize(), ())
+        else:
+            row_ids = range(t.rows)
+        if topic:
+            row_ids = t.matching(row_ids, "Topic", topic)
+        if sample is not None and sample < len(row_ids):
+            row_ids = random.sample(list(row_ids), sample)
+        return [t.row(i) for i in row_ids]
+
+
+def load_snapshot(path):
+    """
+    Maps the snapshot at path, or returns None if it is missing or unusable.
+    """
+    if sys.byteorder != "little" or not os.path.exists(path):
+        return None
+    try:
+        return BankSnapshot(path)
+    except (OSError, ValueError, KeyError) as e:
+        with open("exam_debug.log", "a", encoding="utf-8") as f:
+            f.write(f"SNAPSHOT IGNORED ({path}): {str(e)}\n")
+        return None
@@ -0,0 +1,188 @@
+"""
+Central scheduler for calls to the local Ollama model.
+
+There is one model server, so every call goes through LLMScheduler.run():
+- at most MAX_CONCURRENCY calls run at once (match OLLAMA_NUM_PARALLEL);
+- queued interactive calls (students waiting on a page) always start before
+  background ones (pre-translation and other batch jobs), and background work
+  never takes the last free slot;
+- within a priority class, users are served round-robin, so one user's burst
+  can't starve everyone else;
+- a call is rejected with SchedulerBusy up front when the queue is full or the
+  estimated wait exceeds what the caller would tolerate, instead of sitting in
+  the queue until its HTTP timeout. Callers fall back to their degraded path
+  (placeholder MCQ options, untranslated text).
+
+Limits are per process and read from the environment at startup:
+LLM_MAX_CONCURRENCY (set to OLLAMA_NUM_PARALLEL divided by the number of
+uvicorn workers), LLM_MAX_QUEUE_INTERACTIVE, LLM_MAX_QUEUE_BACKGROUND,
+LLM_MAX_WAIT_INTERACTIVE and LLM_MAX_WAIT_BACKGROUND (seconds; "none" for no
+limit).
+"""
+
+import os
+import threading
+import time
+from collections import OrderedDict, deque
+
+INTERACTIVE = "interactive"
+BACKGROUND = "background"
+PRIORITIES = (INTERACTIVE, BACKGROUND)
+
+
+def _env_int(name, default):
+    value = os.environ.get(name)
+    return int(value) if value else default
+
+
+def _env_seconds(name, default):
+    value = os.environ.get(name)
+    if not value:
+        return default
+    return None if value.lower() == "none" else float(value)
+
+
+MAX_CONCURRENCY = max(1, _env_int("LLM_MAX_CONCURRENCY", 2))
+MAX_QUEUE_DEPTH = {
+    INTERACTIVE: _env_int("LLM_MAX_QUEUE_INTERACTIVE", 32),
+    BACKGROUND: _env_int("LLM_MAX_QUEUE_BACKGROUND", 1024),
+}
+# Longest a call may wait in the queue, in seconds (None: no limit)
+MAX_QUEUE_WAIT = {
+    INTERACTIVE: _env_seconds("LLM_MAX_WAIT_INTERACTIVE", 30),
+    BACKGROUND: _env_seconds("LLM_MAX_WAIT_BACKGROUND", None),
+}
+# Starting guess for the moving average of model call duration, in seconds
+INITIAL_SERVICE_TIME = 10.0
+
+
+class SchedulerBusy(RuntimeError):
+    """
+    Raised when a model call is not admitted, or waited in the queue too long.
+    """
+
+
+class _Ticket:
+    __slots__ = ("priority", "user_id", "granted")
+
+    def __init__(self, priority, user_id):
+        self.priority = priority
+        self.user_id = user_id
+        self.granted = False
+
+
+class LLMScheduler:
+    def __init__(self, max_concurrency=MAX_CONCURRENCY, max_queue_depth=MAX_QUEUE_DEPTH, max_queue_wait=MAX_QUEUE_WAIT):
+        self.max_concurrency = max_concurrency
+        self.max_queue_depth = dict(max_queue_depth)
+        self.max_queue_wait = dict(max_queue_wait)
+        self._cond = threading.Condition()
+        # priority -> user_id -> queued tickets; user order is the round-robin order
+        self._queues = {p: OrderedDict() for p in PRIORITIES}
+        self._queued = {p: 0 for p in PRIORITIES}
+        self._running = {p: 0 for p in PRIORITIES}
+        self._service_time = INITIAL_SERVICE_TIME
+        self._counters = {p: {"completed": 0, "rejected": 0, "timed_out": 0} for p in PRIORITIES}
+
+    # Must be called with self._cond held
+
+    def _estimated_wait(self, priority):
+        ahead = self._queued[INTERACTIVE] + sum(self._running.values())
+        if priority == BACKGROUND:
+            ahead += self._queued[BACKGROUND]
+        return self._service_time * ahead / self.max_concurrency
+
+    def _has_slot(self, priority):
+        running = sum(self._running.values())
+        if priority == BACKGROUND:
+            # Keep one slot free for interactive calls when there is more than one
+            return running < max(1, self.max_concurrency - 1)
+        return running < self.max_concurrency
+
+    def _dispatch(self):
+        granted = False
+        for priority in PRIORITIES:
+            queue = self._queues[priority]
+            while queue and self._has_slot(priority):
+                user_id, tickets = next(iter(queue.items()))
+                ticket = tickets.popleft()
+                if tickets:
+                    queue.move_to_end(user_id)
+                else:
+                    del queue[user_id]
+                self._queued[priority] -= 1
+                self._running[priority] += 1
+                ticket.granted = True
+                granted = True
+            if self._queued[INTERACTIVE]:
+                # Background work waits until no interactive call is queued
+                break
+        if granted:
+            self._cond.notify_all()
+
+    def _remove(self, ticket):
+        tickets = self._queues[ticket.priority].get(ticket.user_id)
+        if tickets is not None and ticket in tickets:
+            tickets.remove(ticket)
+            if not tickets:
+                del self._queues[ticket.priority][ticket.user_id]
+            self._queued[ticket.priority] -= 1
+
+    # Public API
+
+    def run(self, fn, *args, priority=INTERACTIVE, user_id=None):
+        """
+        Runs fn(*args) once a model slot is free and returns its result.
+        Raises SchedulerBusy if the call is not admitted or its queue wait runs out.
+        """
+        if priority not in PRIORITIES:
+            raise ValueError(f"Unknown priority: {priority}")
+        ticket = _Ticket(priority, user_id)
+        max_wait = self.max_queue_wait.get(priority)
+        with self._cond:
+            if self._queued[priority] >= self.max_queue_depth[priority]:
+                self._counters[priority]["rejected"] += 1
+                raise SchedulerBusy(f"Model queue full ({self._queued[priority]} {priority} calls waiting)")
+            if max_wait is not None and not self._has_slot(priority) and self._estimated_wait(priority) > max_wait:
+                self._counters[priority]["rejected"] += 1
+                raise SchedulerBusy(f"Estimated model queue wait exceeds {max_wait}s")
+            self._queues[priority].setdefault(user_id, deque()).append(ticket)
+            self._queued[priority] += 1
+            self._dispatch()
+            deadline = None if max_wait is None else time.monotonic() + max_wait
+            while not ticket.granted:
+                remaining = None if deadline is None else deadline - time.monotonic()
+                if remaining is not None and remaining <= 0:
+                    self._remove(ticket)
+                    self._counters[priority]["timed_out"] += 1
+                    raise SchedulerBusy(f"Waited more than {max_wait}s for a model slot")
+                self._cond.wait(remaining)
+        start = time.monotonic()
+        elapsed = None
+        try:
+            result = fn(*args)
+            elapsed = time.monotonic() - start
+            return result
+        finally:
+            with self._cond:
+                self._running[priority] -= 1
+                self._counters[priority]["completed"] += 1
+                # Failed calls (refused connections, timeouts) say nothing about
+                # how long a real model call takes, so they don't move the estimate
+                if elapsed is not None:
+                    self._service_time = 0.8 * self._service_time + 0.2 * elapsed
+                self._dispatch()
+
+    def stats(self):
+        with self._cond:
+            return {
+                "max_concurrency": self.max_concurrency,
+                "avg_service_time": round(self._service_time, 3),
+                "classes": {
+                    p: dict(self._counters[p], queued=self._queued[p], running=self._running[p])
+                    for p in PRIORITIES
+                },
+            }
+
+
+scheduler = LLMScheduler()
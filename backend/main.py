@@ -1,9 +1,9 @@
 from fastapi import FastAPI, HTTPException
 from fastapi.middleware.cors import CORSMiddleware
 from pydantic import BaseModel
-import sqlite3
 import os
 import random
+from backend.question_bank import DB_CONFIG, fetch_rows
 
 app = FastAPI(
     title="Personalized Exam Simulator",
@@ -46,16 +46,6 @@ exams = {}
 
 # --- Helper functions ---
 
-DB_CONFIG = [
-    # (subject, grade, db_path, table_name)
-    ("Biology", "11", "NCERT_Biology_11th/Biology_11th_Cleaned.sqlite", "Biology_11th_Cleaned"),
-    ("Biology", "12", "NCERT_Biology_12th/Biology_12th_Cleaned.sqlite", "Biology_12th_Cleaned"),
-    ("Chemistry", "11", "NCERT_Chemistry_11th/Chemsitry_11th_Cleaned.sqlite", "Chemsitry_11th_Cleaned"),
-    ("Chemistry", "12", "NCERT_Chemistry_12th/Chemsitry_12th_Cleaned.sqlite", "Chemsitry_12th_Cleaned"),
-    ("Physics", "11", "NCERT_Physics_11th/Physics_11th_Cleaned.sqlite", "Physics_11th_Cleaned"),
-    ("Physics", "12", "NCERT_Physics_12th/Physics_12th_Cleaned.sqlite", "Physics_12th_Cleaned"),
-]
-
 def get_db_configs(subject, grade):
     # subject/grade can be "random"
     subjects = ["Biology", "Chemistry", "Physics"]
@@ -82,28 +72,13 @@ def fetch_questions_with_filters(subject, grade, num_questions, difficulty="rand
     for subj, grd, db_path, table in dbs:
         if not os.path.exists(db_path):
             continue
-        conn = sqlite3.connect(db_path)
-        cursor = conn.cursor()
-        cursor.execute(f"PRAGMA table_info({table})")
-        columns = [row[1] for row in cursor.fetchall()]
-        # Build query
-        query = f"SELECT * FROM {table}"
-        params = []
-        where_clauses = []
-        if topic != "random":
-            where_clauses.append("Topic LIKE ?")
-            params.append(f"%{topic}%")
-        if difficulty != "random":
-            where_clauses.append("Difficulty = ?")
-            params.append(difficulty.capitalize())
-        if where_clauses:
-            query += " WHERE " + " AND ".join(where_clauses)
-        cursor.execute(query, params)
-        rows = cursor.fetchall()
-        for row in rows:
-            q = dict(zip(columns, row))
-            all_questions.append(q)
-        conn.close()
+        all_questions.extend(fetch_rows(
+            db_path,
+            table,
+            difficulty=None if difficulty == "random" else difficulty,
+            topic=None if topic == "random" else topic,
+            sample=num_questions,
+        ))
     if not all_questions:
         raise HTTPException(status_code=404, detail="No questions found for the selected filters.")
     # If difficulty is random, pick random difficulties per question
@@ -1,17 +1,31 @@
 from fastapi import FastAPI, HTTPException
 from fastapi.middleware.cors import CORSMiddleware
+from fastapi.middleware.gzip import GZipMiddleware
+from fastapi.responses import JSONResponse
 from pydantic import BaseModel
 from typing import Literal, List, Dict, Any, Optional
-import sqlite3
 import os
 import random
 from datetime import datetime
-from backend.mcq_generator import generate_mcqs_for_exam
+from backend import analytics
+from backend.llm_scheduler import scheduler
+from backend.mcq_generator import generate_mcqs_for_exam, mcq_generation_stats
+from backend.question_bank import DB_CONFIG, fetch_rows
+from backend.translation import translate_mcqs, translate_questions
+from backend.submission_store import SUBMISSIONS_DIR, archive, grade_answers
+
+# orjson is optional; fall back to the stdlib encoder when it is not installed
+try:
+    import orjson  # noqa: F401
+    from fastapi.responses import ORJSONResponse as DefaultResponse
+except ImportError:
+    DefaultResponse = JSONResponse
 
 app = FastAPI(
     title="Personalized Exam Simulator (Multi-Subject)",
     description="Offline, adaptive Olympiad/mock exam generator and evaluator with multi-subject support.",
-    version="2.0.0"
+    version="2.0.0",
+    default_response_class=DefaultResponse
 )
 
 # Allow CORS for local frontend development
@@ -23,6 +37,9 @@ app.add_middleware(
     allow_headers=["*"],
 )
 
+# Exam payloads are mostly repetitive question text and compress well
+app.add_middleware(GZipMiddleware, minimum_size=1000)
+
 # --- Models ---
 
 # TopicRequest removed
@@ -48,6 +65,43 @@ class FeedbackRequest(BaseModel):
 
 class MCQQuestionsRequest(BaseModel):
     questions: List[Dict[str, Any]]
+    exam_id: Optional[str] = None  # lets the server use the untranslated originals
+    language: Optional[str] = None  # defaults to the exam's language
+    user_id: Optional[str] = None  # used for fair scheduling; taken from the exam when known
+
+# Response models only carry the fields the clients render or send back to
+# /generate_mcqs; the full DB rows stay in the server-side exam store.
+class ExamQuestion(BaseModel):
+    Question: Optional[str] = None
+    Answer: Optional[str] = None
+    Difficulty: Optional[str] = None
+    Topic: Optional[str] = None
+    subject: Optional[str] = None
+    grade: Optional[str] = None
+    # Present once submit_answers has swapped in the MCQ-enriched questions
+    question: Optional[str] = None
+    options: Optional[List[Any]] = None
+    answer_index: Optional[int] = None
+    topic: Optional[str] = None
+    difficulty: Optional[str] = None
+
+class ExamFilter(BaseModel):
+    subject: str
+    grade: str
+    difficulty: str
+
+class ExamResponse(BaseModel):
+    exam_id: str
+    user_id: str
+    filters: List[ExamFilter]
+    questions: List[ExamQuestion]
+    language: str = "en"
+    status: str
+    created_at: str
+
+class ExamDetailResponse(ExamResponse):
+    answers: Dict[str, Any] = {}
+    score: Optional[float] = None
 
 # --- In-memory user state (for demo, replace with persistent storage for production) ---
 user_progress = {}
@@ -55,16 +109,6 @@ exams = {}
 
 # --- Helper functions ---
 
-DB_CONFIG = [
-    # (subject, grade, db_path, table_name)
-    ("Biology", "11", "NCERT_Biology_11th/Biology_11th_Cleaned.sqlite", "Biology_11th_Cleaned"),
-    ("Biology", "12", "NCERT_Biology_12th/Biology_12th_Cleaned.sqlite", "Biology_12th_Cleaned"),
-    ("Chemistry", "11", "NCERT_Chemistry_11th/Chemsitry_11th_Cleaned.sqlite", "Chemsitry_11th_Cleaned"),
-    ("Chemistry", "12", "NCERT_Chemistry_12th/Chemsitry_12th_Cleaned.sqlite", "Chemsitry_12th_Cleaned"),
-    ("Physics", "11", "NCERT_Physics_11th/Physics_11th_Cleaned.sqlite", "Physics_11th_Cleaned"),
-    ("Physics", "12", "NCERT_Physics_12th/Physics_12th_Cleaned.sqlite", "Physics_12th_Cleaned"),
-]
-
 def get_db_configs(subject, grade):
     # subject/grade can be "random"
     subjects = ["Biology", "Chemistry", "Physics"]
@@ -85,39 +129,24 @@ def get_db_configs(subject, grade):
                     selected.append(conf)
     return selected
 
-def fetch_questions_with_filters(subject, grade, difficulty="easy"):
+def fetch_questions_with_filters(subject, grade, difficulty="easy", limit=None):
     dbs = get_db_configs(subject, grade)
     all_questions = []
     for subj, grd, db_path, table in dbs:
         if not os.path.exists(db_path):
             continue
-        conn = sqlite3.connect(db_path)
-        cursor = conn.cursor()
-        cursor.execute(f"PRAGMA table_info({table})")
-        columns = [row[1] for row in cursor.fetchall()]
-        # Build query without topic filter
-        query = f"SELECT * FROM {table}"
-        params = []
-        where_clauses = []
-        if difficulty:
-            where_clauses.append("Difficulty = ?")
-            params.append(difficulty.capitalize())
-        if where_clauses:
-            query += " WHERE " + " AND ".join(where_clauses)
-        cursor.execute(query, params)
-        rows = cursor.fetchall()
-        for row in rows:
-            q = dict(zip(columns, row))
+        # Sample in the bank layer so only the returned rows are materialized
+        rows = fetch_rows(db_path, table, difficulty=difficulty, sample=limit)
+        for q in rows:
             q["subject"] = subj  # Tag question with subject
             q["grade"] = grd
             all_questions.append(q)
         # DEBUG: Log how many questions were found for this filter
         with open("exam_debug.log", "a", encoding="utf-8") as f:
-            f.write(f"DB: {db_path}, Table: {table}, Subject: {subj}, Grade: {grd}, Difficulty: {difficulty}, Found: {len(rows)}\n")
-        conn.close()
+            f.write(f"DB: {db_path}, Table: {table}, Subject: {subj}, Grade: {grd}, Difficulty: {difficulty}, Returned: {len(rows)}\n")
     if not all_questions:
         raise HTTPException(status_code=404, detail=f"No questions found for {subject} {grade} with the selected filters.")
-    # Return all matching questions (no sampling)
+    # Up to `limit` matching questions per bank (all of them when limit is None)
     return all_questions
 
 # --- API Endpoints ---
@@ -134,7 +163,7 @@ def list_subjects():
         ]
     }
 
-@app.post("/generate_exam")
+@app.post("/generate_exam", response_model=ExamResponse, response_model_exclude_none=True)
 def generate_exam(req: ExamRequest):
     # req.subjects: list of SubjectSelection
     all_questions = []
@@ -148,7 +177,8 @@ def generate_exam(req: ExamRequest):
         questions = fetch_questions_with_filters(
             subj_sel.subject,
             grade,
-            subj_sel.difficulty
+            subj_sel.difficulty,
+            limit=5
         )
         # Limit to 5 questions per subject if more are available
         if len(questions) > 5:
@@ -176,6 +206,7 @@ def generate_exam(req: ExamRequest):
         "user_id": req.user_id,
         "filters": filters,
         "questions": all_questions,
+        "language": req.language,
         "answers": {},
         "score": None,
         "status": "created",
@@ -183,20 +214,48 @@ def generate_exam(req: ExamRequest):
     }
     exams[exam_id] = test_obj
     user_progress.setdefault(req.user_id, []).append(exam_id)
-    return test_obj
+    # The store keeps the English originals for MCQ generation and analytics; only
+    # the response is translated. Cache misses come back in English and are
+    # translated in the background rather than holding up the page.
+    response = dict(test_obj)
+    response["questions"] = translate_questions(all_questions, req.language, user_id=req.user_id, wait=False)
+    return response
 
 @app.post("/generate_mcqs")
 def generate_mcqs(req: MCQQuestionsRequest):
+    # Generate from the stored English questions when the exam is known, so the
+    # model sees the originals and the options are translated exactly once
+    stored = exams.get(req.exam_id) if req.exam_id else None
+    language = req.language or (stored or {}).get("language") or "en"
+    # The exam records who it was generated for, which is more reliable than the client
+    user_id = stored["user_id"] if stored else req.user_id
     # Wrap in exam-like dict for compatibility with mcq_generator
-    exam = {"questions": req.questions}
-    mcq_results = generate_mcqs_for_exam(exam)
+    exam = {"questions": stored["questions"] if stored else req.questions}
+    mcq_results = generate_mcqs_for_exam(exam, user_id=user_id)
+    mcq_results = translate_mcqs(mcq_results, language, user_id=user_id)
     return {"mcqs": mcq_results}
 
+@app.get("/stats/mcq_generation")
+def mcq_stats():
+    """
+    Single-flight counters for MCQ generation: how many calls were served by another in-flight request.
+    """
+    return mcq_generation_stats()
+
+@app.get("/stats/llm_scheduler")
+def llm_scheduler_stats():
+    """
+    Queue depth, running calls and admission counters per priority class for the model scheduler.
+    """
+    return scheduler.stats()
+
 @app.post("/submit_answers")
 def submit_answers(sub: AnswerSubmission):
-    import json
     from datetime import datetime
 
+    if sub.user_id == analytics.CLASS_ID:
+        # Reserved for the class-wide analytics rows
+        raise HTTPException(status_code=400, detail="Invalid user_id.")
     exam = exams.get(sub.exam_id)
     if not exam or exam["user_id"] != sub.user_id:
         raise HTTPException(status_code=404, detail="Exam not found for user.")
@@ -216,64 +275,35 @@ def submit_answers(sub: AnswerSubmission):
         exam["questions"] = mcq_questions
 
     # Auto-evaluate (assume 'answer' column in DB)
-    correct = 0
+    results = grade_answers(exam["questions"], sub.answers)
+    correct = sum(results)
     total = len(exam["questions"])
-    for idx, q in enumerate(exam["questions"]):
-        qid = str(q.get("id") or q.get("question_id") or q.get("QID") or q.get("qid") or q.get("index") or idx)
-        user_ans = sub.answers.get(qid)
-        # Use MCQ correct option if available, else fallback to DB answer
-        options = q.get("options")
-        answer_index = q.get("answer_index")
-        if options and answer_index is not None and 0 <= answer_index < len(options):
-            correct_ans = str(options[answer_index])
-        else:
-            correct_ans = str(q.get("answer") or q.get("Answer") or q.get("correct_answer") or "")
-        if user_ans is not None and user_ans.strip().lower() == correct_ans.strip().lower():
-            correct += 1
     score = correct / total if total else 0
     exam["score"] = score
 
-    # --- Save submission to file ---
-    # Build a detailed questions_with_answers array for robust review
-    questions_with_answers = []
-    for idx, q in enumerate(exam["questions"]):
-        qid = str(q.get("id") or q.get("question_id") or q.get("QID") or q.get("qid") or q.get("index") or idx)
-        user_ans = sub.answers.get(qid, "")
-        options = q.get("options")
-        answer_index = q.get("answer_index")
-        if options and answer_index is not None and 0 <= answer_index < len(options):
-            correct_ans = str(options[answer_index])
-        else:
-            correct_ans = str(q.get("answer") or q.get("Answer") or q.get("correct_answer") or "")
-        questions_with_answers.append({
-            "question_id": qid,
-            "question": q.get("question") or q.get("Question") or "",
-            "options": options if options else None,
-            "user_answer": user_ans,
-            "correct_answer": correct_ans,
-            "subject": q.get("subject", ""),
-            "topic": q.get("topic", ""),
-            "difficulty": q.get("difficulty", "")
-        })
-
+    # --- Save submission to the archive ---
+    # Questions are stored once in the archive's question table; the review rows
+    # (questions_with_answers) are rebuilt from them when the submission is read.
     submission_data = {
         "user_id": sub.user_id,
         "exam_id": sub.exam_id,
         "answers": sub.answers,
         "questions": exam["questions"],
-        "questions_with_answers": questions_with_answers,
         "score": score,
         "correct": correct,
         "total": total,
         "filters": exam.get("filters", {}),
         "submitted_at": datetime.now().strftime("%Y-%m-%d %H:%M:%S"),
     }
-    submissions_dir = os.path.join(os.path.dirname(__file__), "submissions")
-    os.makedirs(submissions_dir, exist_ok=True)
     filename = f"{sub.exam_id}_{sub.user_id}_{datetime.now().strftime('%Y%m%d_%H%M%S')}.json"
-    filepath = os.path.join(submissions_dir, filename)
-    with open(filepath, "w", encoding="utf-8") as f:
-        json.dump(submission_data, f, ensure_ascii=False, indent=2)
+    archive.append(filename, submission_data)
+    # The submission is already saved; a failed counter update must not turn into
+    # a 500 (and a duplicate on retry). `python -m backend.analytics` repairs it.
+    try:
+        analytics.record_submission(filename, sub.user_id, exam["questions"], results, submission_data["submitted_at"])
+    except Exception as e:
+        with open("exam_debug.log", "a", encoding="utf-8") as f:
+            f.write(f"ANALYTICS ERROR for {filename}: {str(e)}\n")
 
     return {"score": score, "correct": correct, "total": total}
 
@@ -305,11 +335,13 @@ def list_user_submissions(user_id: str):
     """
     import json
 
-    submissions_dir = os.path.join(os.path.dirname(__file__), "submissions")
-    if not os.path.exists(submissions_dir):
-        return []
-    files = [f for f in os.listdir(submissions_dir) if f.endswith(".json") and user_id in f]
-    submissions = []
+    submissions = archive.list_for_user(user_id)
+    archived = {s["filename"] for s in submissions}
+    # Legacy JSON files that have not been migrated into the archive yet
+    submissions_dir = SUBMISSIONS_DIR
+    files = []
+    if os.path.exists(submissions_dir):
+        files = [f for f in os.listdir(submissions_dir) if f.endswith(".json") and user_id in f and f not in archived]
     for fname in sorted(files, reverse=True):
         fpath = os.path.join(submissions_dir, fname)
         try:
@@ -364,12 +396,14 @@ def get_submission(filename: str):
     """
     import json
 
-    submissions_dir = os.path.join(os.path.dirname(__file__), "submissions")
-    fpath = os.path.join(submissions_dir, filename)
-    if not os.path.exists(fpath):
-        raise HTTPException(status_code=404, detail="Submission file not found.")
-    with open(fpath, "r", encoding="utf-8") as f:
-        data = json.load(f)
+    data = archive.load(filename)
+    if data is None:
+        # Fall back to a legacy JSON submission file
+        fpath = os.path.join(SUBMISSIONS_DIR, filename)
+        if not os.path.exists(fpath):
+            raise HTTPException(status_code=404, detail="Submission file not found.")
+        with open(fpath, "r", encoding="utf-8") as f:
+            data = json.load(f)
     # Only return the review-relevant fields
     return {
         "submitted_at": data.get("submitted_at"),
@@ -380,12 +414,31 @@ def get_submission(filename: str):
         "questions_with_answers": data.get("questions_with_answers", [])
     }
 
-@app.get("/exam/{exam_id}")
+@app.get("/analytics")
+def class_analytics():
+    """
+    Class-wide accuracy per subject, topic and difficulty, plus the daily trend.
+    """
+    return analytics.get_summary()
+
+@app.get("/analytics/{user_id}")
+def user_analytics(user_id: str):
+    """
+    Accuracy per subject, topic and difficulty, daily trend and streaks for one user.
+    """
+    if user_id == analytics.CLASS_ID:
+        raise HTTPException(status_code=400, detail="Invalid user_id; use /analytics for class-wide data.")
+    return analytics.get_summary(user_id)
+
+@app.get("/exam/{exam_id}", response_model=ExamDetailResponse, response_model_exclude_none=True)
 def get_exam(exam_id: str):
     exam = exams.get(exam_id)
     if not exam:
         raise HTTPException(status_code=404, detail="Exam not found.")
-    return exam
+    # Translated the same way as the /generate_exam response
+    response = dict(exam)
+    response["questions"] = translate_questions(exam["questions"], exam["language"], user_id=exam["user_id"], wait=False)
+    return response
 
 @app.get("/")
 def root():
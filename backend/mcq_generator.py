@@ -1,10 +1,101 @@
+import threading
 import requests
+from backend.llm_scheduler import INTERACTIVE, scheduler
 
-def generate_mcq_with_ollama(question, answer, difficulty):
+OLLAMA_URL = "http://localhost:11434/api/generate"
+OLLAMA_MODEL = "gemma3n:e4b-it-fp16"
+
+def ollama_generate(prompt, timeout=60, priority=INTERACTIVE, user_id=None):
+    """
+    Sends a single non-streaming prompt to the local Ollama gemma3n model and returns the raw response text.
+    The call is queued in the shared LLM scheduler; raises SchedulerBusy if it is not admitted.
+    """
+    return scheduler.run(_post_to_ollama, prompt, timeout, priority=priority, user_id=user_id)
+
+def _post_to_ollama(prompt, timeout):
+    response = requests.post(
+        OLLAMA_URL,
+        json={
+            "model": OLLAMA_MODEL,
+            "prompt": prompt,
+            "stream": False
+        },
+        timeout=timeout
+    )
+    response.raise_for_status()
+    return response.json().get("response", "")
+
+class SingleFlight:
+    """
+    Collapses concurrent calls with the same key into one execution: the first
+    caller runs the function, later callers arriving while it is in flight wait
+    for it and receive the same result.
+    """
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._in_flight = {}  # key -> (done event, result holder)
+        self.calls = 0
+        self.executions = 0
+        self.coalesced = 0
+
+    def do(self, key, fn, *args):
+        with self._lock:
+            self.calls += 1
+            call = self._in_flight.get(key)
+            if call is None:
+                call = self._in_flight[key] = (threading.Event(), {})
+                leader = True
+                self.executions += 1
+            else:
+                leader = False
+                self.coalesced += 1
+        done, holder = call
+        if not leader:
+            done.wait()
+            return holder.get("result")
+        try:
+            holder["result"] = fn(*args)
+        finally:
+            with self._lock:
+                del self._in_flight[key]
+            done.set()
+        return holder["result"]
+
+    def stats(self):
+        with self._lock:
+            return {
+                "calls": self.calls,
+                "executions": self.executions,
+                "coalesced": self.coalesced,
+                "in_flight": len(self._in_flight),
+            }
+
+_mcq_flight = SingleFlight()
+
+def generate_mcq_with_ollama(question, answer, difficulty, user_id=None):
     """
     Calls the local Ollama gemma3n model to generate MCQ options for a question.
     Returns a dict: { "options": [...], "answer_index": int }
+    Concurrent calls for the same question, answer and difficulty share one model call.
     """
+    key = (question, answer, (difficulty or "").lower())
+    mcq = _mcq_flight.do(key, _generate_mcq, question, answer, difficulty, user_id)
+    # Every waiter gets the same object; hand out copies so callers can't affect each other
+    if mcq is None:
+        return None
+    mcq = dict(mcq)
+    if isinstance(mcq.get("options"), list):
+        mcq["options"] = list(mcq["options"])
+    return mcq
+
+def mcq_generation_stats():
+    """
+    Returns single-flight counters for MCQ generation (calls, model executions, coalesced calls).
+    """
+    return _mcq_flight.stats()
+
+def _generate_mcq(question, answer, difficulty, user_id):
     if difficulty.lower() == "easy":
         distractor_instruction = "Make the 3 incorrect options totally different from the correct answer."
     elif difficulty.lower() == "medium":
@@ -20,18 +111,8 @@ def generate_mcq_with_ollama(question, answer, difficulty):
         f"Each option should be ONLY the content, WITHOUT any 'A.', 'B.', 'C.', or 'D.' or any similar prefix. Do not include any explanation or text outside the JSON."
     )
     try:
-        response = requests.post(
-            "http://localhost:11434/api/generate",
-            json={
-                "model": "gemma3n:e4b-it-fp16",
-                "prompt": prompt,
-                "stream": False
-            },
-            timeout=60
-        )
-        response.raise_for_status()
+        text = ollama_generate(prompt, user_id=user_id)
         import json as pyjson
-        text = response.json().get("response", "")
         # DEBUG: log the raw response for troubleshooting
         with open("ollama_mcq_debug.log", "a", encoding="utf-8") as f:
             f.write(f"\nPROMPT:\n{prompt}\nRESPONSE:\n{text}\n{'='*40}\n")
@@ -54,7 +135,7 @@ def generate_mcq_with_ollama(question, answer, difficulty):
             f.write(f"\nERROR: {str(e)}\n")
         return None
 
-def generate_mcqs_for_exam(exam):
+def generate_mcqs_for_exam(exam, user_id=None):
     """
     Given an exam dict (with a 'questions' list), returns a list of MCQ dicts for each question.
     """
@@ -63,13 +144,15 @@ def generate_mcqs_for_exam(exam):
         question_text = q.get("Question")
         answer_text = q.get("Answer")
         difficulty = q.get("Difficulty", "medium")
-        mcq = generate_mcq_with_ollama(question_text, answer_text, difficulty)
+        mcq = generate_mcq_with_ollama(question_text, answer_text, difficulty, user_id)
         if mcq:
             mcq_results.append({
                 "question": question_text,
                 "options": mcq.get("options"),
                 "answer_index": mcq.get("answer_index"),
-                "difficulty": difficulty
+                "difficulty": difficulty,
+                "subject": q.get("subject"),
+                "topic": q.get("Topic")
             })
         else:
             import random
@@ -80,6 +163,8 @@ def generate_mcqs_for_exam(exam):
                 "question": question_text,
                 "options": options,
                 "answer_index": answer_index,
-                "difficulty": difficulty
+                "difficulty": difficulty,
+                "subject": q.get("subject"),
+                "topic": q.get("Topic")
             })
     return mcq_results
@@ -0,0 +1,138 @@
+import os
+import sqlite3
+import threading
+from backend.bank_snapshot import load_snapshot
+
+DB_CONFIG = [
+    # (subject, grade, db_path, table_name)
+    ("Biology", "11", "NCERT_Biology_11th/Biology_11th_Cleaned.sqlite", "Biology_11th_Cleaned"),
+    ("Biology", "12", "NCERT_Biology_12th/Biology_12th_Cleaned.sqlite", "Biology_12th_Cleaned"),
+    ("Chemistry", "11", "NCERT_Chemistry_11th/Chemsitry_11th_Cleaned.sqlite", "Chemsitry_11th_Cleaned"),
+    ("Chemistry", "12", "NCERT_Chemistry_12th/Chemsitry_12th_Cleaned.sqlite", "Chemsitry_12th_Cleaned"),
+    ("Physics", "11", "NCERT_Physics_11th/Physics_11th_Cleaned.sqlite", "Physics_11th_Cleaned"),
+    ("Physics", "12", "NCERT_Physics_12th/Physics_12th_Cleaned.sqlite", "Physics_12th_Cleaned"),
+]
+
+# The banks are large enough to fit entirely in the mapping; every worker then
+# reads the same OS page-cache pages instead of copying them into its own heap.
+MMAP_SIZE = 256 * 1024 * 1024
+# Above sqlite3's default of 128, so every bank/filter combination stays prepared
+CACHED_STATEMENTS = 256
+
+# Built by build_bank_snapshot.py; used instead of SQLite when present and fresh
+SNAPSHOT_PATH = "question_bank.snapshot"
+
+_local = threading.local()
+_schema_cache = {}
+_schema_lock = threading.Lock()
+_snapshot = None
+_snapshot_loaded = False
+_snapshot_lock = threading.Lock()
+
+
+def _connect(db_path):
+    # immutable=1 tells SQLite the file never changes while open, so it skips
+    # locking and change detection entirely. The banks are only rewritten
+    # offline by convert_csv_to_sqlite.py, with the server stopped.
+    uri = f"file:{os.path.abspath(db_path)}?mode=ro&immutable=1"
+    conn = sqlite3.connect(uri, uri=True, cached_statements=CACHED_STATEMENTS)
+    conn.execute(f"PRAGMA mmap_size={MMAP_SIZE}")
+    return conn
+
+
+def get_snapshot():
+    """
+    Returns the mapped question-bank snapshot, loading it on first use, or None if there is none.
+    """
+    global _snapshot, _snapshot_loaded
+    if not _snapshot_loaded:
+        with _snapshot_lock:
+            if not _snapshot_loaded:
+                _snapshot = load_snapshot(SNAPSHOT_PATH)
+                if _snapshot is not None and _snapshot.stale:
+                    with open("exam_debug.log", "a", encoding="utf-8") as f:
+                        f.write(f"SNAPSHOT STALE for {_snapshot.stale}; using SQLite for those banks. "
+                                f"Re-run build_bank_snapshot.py to refresh it.\n")
+                _snapshot_loaded = True
+    return _snapshot
+
+
+def get_connection(db_path):
+    """
+    Returns this thread's read-only connection to a question bank, opening it on first use.
+    Raises FileNotFoundError if the bank does not exist on disk.
+    """
+    pool = getattr(_local, "connections", None)
+    if pool is None:
+        pool = _local.connections = {}
+    conn = pool.get(db_path)
+    if conn is None:
+        if not os.path.exists(db_path):
+            raise FileNotFoundError(db_path)
+        conn = pool[db_path] = _connect(db_path)
+    return conn
+
+
+def get_columns(db_path, table):
+    """
+    Returns the column names of a bank table. The schema is read once per process.
+    """
+    key = (db_path, table)
+    columns = _schema_cache.get(key)
+    if columns is None:
+        cursor = get_connection(db_path).execute(f"PRAGMA table_info({table})")
+        columns = [row[1] for row in cursor.fetchall()]
+        with _schema_lock:
+            _schema_cache[key] = columns
+    return columns
+
+
+def list_tables(db_path):
+    cursor = get_connection(db_path).execute("SELECT name FROM sqlite_master WHERE type='table'")
+    return [row[0] for row in cursor.fetchall()]
+
+
+def query(db_path, sql, params=()):
+    """
+    Runs a read-only statement on the bank and returns all rows.
+    Statements are kept in the connection's prepared-statement cache, so callers
+    should pass values as parameters rather than formatting them into the SQL.
+    """
+    return get_connection(db_path).execute(sql, params).fetchall()
+
+
+def _like_pattern(text):
+    # Match text literally: % and _ in user input must not act as LIKE wildcards
+    escaped = text.replace("\\", "\\\\").replace("%", "\\%").replace("_", "\\_")
+    return f"%{escaped}%"
+
+
+def fetch_rows(db_path, table, difficulty=None, topic=None, sample=None):
+    """
+    Returns the matching rows of a bank table as dicts keyed by column name.
+    topic is matched as a literal substring (ASCII case-insensitive, as SQLite's
+    LIKE), difficulty exactly (capitalized as stored). With sample=k, returns k
+    matching rows picked at random instead of all of them.
+    Sampled reads are served from the snapshot when it covers the table: it
+    filters on its column arrays and builds dicts only for the sampled rows.
+    Full reads go to SQLite, which materializes whole result sets faster.
+    """
+    snapshot = get_snapshot() if sample is not None else None
+    if snapshot is not None and snapshot.has(db_path, table):
+        return snapshot.fetch_rows(db_path, table, difficulty=difficulty, topic=topic, sample=sample)
+    columns = get_columns(db_path, table)
+    sql = f"SELECT * FROM {table}"
+    params = []
+    where_clauses = []
+    if topic:
+        where_clauses.append("Topic LIKE ? ESCAPE '\\'")
+        params.append(_like_pattern(topic))
+    if difficulty:
+        where_clauses.append("Difficulty = ?")
+        params.append(difficulty.capitalize())
+    if where_clauses:
+        sql += " WHERE " + " AND ".join(where_clauses)
+    if sample is not None:
+        sql += " ORDER BY RANDOM() LIMIT ?"
+        params.append(sample)
+    return [dict(zip(columns, row)) for row in query(db_path, sql, params)]
@@ -0,0 +1,277 @@
+"""
+Append-only archive for exam submissions.
+
+Records are zlib-compressed JSON appended to segment files under
+backend/submissions/archive. Each question is stored once, keyed by a hash of
+its content; submission records reference questions by that id and keep only
+the answers and scoring metadata. The review shape returned by
+/submission/{filename} is rebuilt from the two on read.
+
+Every record goes out in a single O_APPEND write, so several uvicorn workers
+can append to the same segment; each one picks up the others' records on
+refresh().
+"""
+
+import hashlib
+import json
+import os
+import struct
+import threading
+import zlib
+
+SUBMISSIONS_DIR = os.path.join(os.path.dirname(__file__), "submissions")
+ARCHIVE_DIR = os.path.join(SUBMISSIONS_DIR, "archive")
+SEGMENT_MAX_BYTES = 8 * 1024 * 1024
+
+RECORD_QUESTION = 1
+RECORD_SUBMISSION = 2
+_HEADER = struct.Struct(">BI")  # record kind, compressed payload length
+
+# Listing fields kept in memory for every submission, as returned by /user_submissions
+SUMMARY_FIELDS = ("exam_id", "submitted_at", "score", "filters", "total", "correct")
+
+
+# --- Question helpers shared with the scoring code ---
+
+def question_key(q, idx):
+    return str(q.get("id") or q.get("question_id") or q.get("QID") or q.get("qid") or q.get("index") or idx)
+
+
+def expected_answer(q):
+    # Use MCQ correct option if available, else fallback to DB answer
+    options = q.get("options")
+    answer_index = q.get("answer_index")
+    if options and answer_index is not None and 0 <= answer_index < len(options):
+        return str(options[answer_index])
+    return str(q.get("answer") or q.get("Answer") or q.get("correct_answer") or "")
+
+
+def grade_answers(questions, answers):
+    """
+    Returns one bool per question: whether the submitted answer matches the expected one.
+    This is the single scoring rule used for the stored score and the analytics.
+    """
+    results = []
+    for idx, q in enumerate(questions):
+        user_ans = answers.get(question_key(q, idx))
+        results.append(user_ans is not None and user_ans.strip().lower() == expected_answer(q).strip().lower())
+    return results
+
+
+def build_questions_with_answers(questions, answers):
+    """
+    Builds the per-question review rows stored with a submission.
+    """
+    rows = []
+    for idx, q in enumerate(questions):
+        qid = question_key(q, idx)
+        options = q.get("options")
+        rows.append({
+            "question_id": qid,
+            "question": q.get("question") or q.get("Question") or "",
+            "options": options if options else None,
+            "user_answer": answers.get(qid, ""),
+            "correct_answer": expected_answer(q),
+            "subject": q.get("subject", ""),
+            "topic": q.get("topic", ""),
+            "difficulty": q.get("difficulty", "")
+        })
+    return rows
+
+
+def encode_record(record):
+    return zlib.compress(json.dumps(record, ensure_ascii=False, separators=(",", ":")).encode("utf-8"))
+
+
+def decode_record(payload):
+    return json.loads(zlib.decompress(payload))
+
+
+def question_hash(q):
+    canonical = json.dumps(q, sort_keys=True, ensure_ascii=False, separators=(",", ":"))
+    return hashlib.blake2b(canonical.encode("utf-8"), digest_size=12).hexdigest()
+
+
+# --- Archive ---
+
+class SubmissionArchive:
+    """
+    Segment-file archive of submissions. Safe to share between threads; other
+    processes appending to the same directory are picked up by refresh().
+    """
+
+    def __init__(self, directory=ARCHIVE_DIR, segment_max_bytes=SEGMENT_MAX_BYTES):
+        self.directory = directory
+        self.segment_max_bytes = segment_max_bytes
+        self._lock = threading.Lock()
+        self._scanned = {}      # segment name -> bytes indexed so far
+        self._questions = {}    # question hash -> (segment, offset)
+        self._submissions = {}  # filename -> (segment, offset)
+        self._summaries = {}    # filename -> listing metadata (incl. user_id)
+
+    # Reading
+
+    def _segments(self):
+        if not os.path.isdir(self.directory):
+            return []
+        return sorted(f for f in os.listdir(self.directory) if f.endswith(".seg"))
+
+    def _read_record(self, segment, offset):
+        with open(os.path.join(self.directory, segment), "rb") as f:
+            f.seek(offset)
+            kind, length = _HEADER.unpack(f.read(_HEADER.size))
+            return kind, decode_record(f.read(length))
+
+    def _scan_segment(self, segment):
+        path = os.path.join(self.directory, segment)
+        offset = self._scanned.get(segment, 0)
+        with open(path, "rb") as f:
+            f.seek(offset)
+            while True:
+                header = f.read(_HEADER.size)
+                if len(header) < _HEADER.size:
+                    break
+                kind, length = _HEADER.unpack(header)
+                payload = f.read(length)
+                if len(payload) < length:
+                    # Partially written tail; picked up on the next refresh
+                    break
+                if kind == RECORD_QUESTION:
+                    record = decode_record(payload)
+                    self._questions[record["id"]] = (segment, offset)
+                elif kind == RECORD_SUBMISSION:
+                    record = decode_record(payload)
+                    filename = record["filename"]
+                    self._submissions[filename] = (segment, offset)
+                    summary = {key: record.get(key) for key in SUMMARY_FIELDS}
+                    summary["user_id"] = record.get("user_id")
+                    self._summaries[filename] = summary
+                offset += _HEADER.size + length
+        self._scanned[segment] = offset
+
+    def refresh(self):
+        """
+        Indexes any records appended since the last scan.
+        """
+        with self._lock:
+            for segment in self._segments():
+                self._scan_segment(segment)
+
+    def _load_question(self, qhash):
+        segment, offset = self._questions[qhash]
+        return self._read_record(segment, offset)[1]["question"]
+
+    def load(self, filename):
+        """
+        Rebuilds the full submission dict (the shape submit_answers used to write
+        as JSON), or returns None if the archive has no such submission.
+        """
+        if filename not in self._submissions:
+            self.refresh()
+        location = self._submissions.get(filename)
+        if location is None:
+            return None
+        record = self._read_record(*location)[1]
+        questions = [self._load_question(qhash) for qhash in record["question_ids"]]
+        questions_with_answers = record.get("questions_with_answers")
+        if questions_with_answers is None:
+            questions_with_answers = build_questions_with_answers(questions, record["answers"])
+        return {
+            "user_id": record["user_id"],
+            "exam_id": record["exam_id"],
+            "answers": record["answers"],
+            "questions": questions,
+            "questions_with_answers": questions_with_answers,
+            "score": record["score"],
+            "correct": record["correct"],
+            "total": record["total"],
+            "filters": record["filters"],
+            "submitted_at": record["submitted_at"],
+        }
+
+    def list_for_user(self, user_id):
+        """
+        Returns listing metadata for every archived submission of user_id.
+        """
+        self.refresh()
+        listing = []
+        for filename, summary in self._summaries.items():
+            if summary["user_id"] == user_id:
+                entry = {"filename": filename}
+                entry.update((key, summary[key]) for key in SUMMARY_FIELDS)
+                listing.append(entry)
+        return listing
+
+    def filenames(self):
+        self.refresh()
+        return list(self._submissions)
+
+    def __contains__(self, filename):
+        if filename not in self._submissions:
+            self.refresh()
+        return filename in self._submissions
+
+    # Writing
+
+    def _writable_segment(self):
+        segments = self._segments()
+        if not segments:
+            return "segment-00000.seg"
+        last = segments[-1]
+        size = os.path.getsize(os.path.join(self.directory, last))
+        # Roll over when full, or when the tail holds a torn record from an
+        # interrupted write that later records must not be appended after
+        if size < self.segment_max_bytes and size == self._scanned.get(last, 0):
+            return last
+        index = int(last[len("segment-"):-len(".seg")]) + 1
+        return f"segment-{index:05d}.seg"
+
+    def _append(self, f, kind, record):
+        payload = encode_record(record)
+        data = _HEADER.pack(kind, len(payload)) + payload
+        f.write(data)
+        f.flush()
+        return f.tell() - len(data)
+
+    def append(self, filename, submission, questions_with_answers=None):
+        """
+        Archives a submission dict (same keys as load() returns). Questions not
+        yet in the archive are written first. questions_with_answers is only
+        stored when it cannot be rebuilt from the questions and answers.
+        """
+        os.makedirs(self.directory, exist_ok=True)
+        with self._lock:
+            for segment in self._segments():
+                self._scan_segment(segment)
+            segment = self._writable_segment()
+            with open(os.path.join(self.directory, segment), "ab", buffering=0) as f:
+                question_ids = []
+                for q in submission["questions"]:
+                    qhash = question_hash(q)
+                    if qhash not in self._questions:
+                        offset = self._append(f, RECORD_QUESTION, {"id": qhash, "question": q})
+                        self._questions[qhash] = (segment, offset)
+                    question_ids.append(qhash)
+                record = {
+                    "filename": filename,
+                    "user_id": submission["user_id"],
+                    "exam_id": submission["exam_id"],
+                    "answers": submission["answers"],
+                    "question_ids": question_ids,
+                    "score": submission["score"],
+                    "correct": submission["correct"],
+                    "total": submission["total"],
+                    "filters": submission["filters"],
+                    "submitted_at": submission["submitted_at"],
+                }
+                if questions_with_answers is not None:
+                    record["questions_with_answers"] = questions_with_answers
+                offset = self._append(f, RECORD_SUBMISSION, record)
+                os.fsync(f.fileno())
+            self._submissions[filename] = (segment, offset)
+            summary = {key: record.get(key) for key in SUMMARY_FIELDS}
+            summary["user_id"] = record["user_id"]
+            self._summaries[filename] = summary
+
+
+archive = SubmissionArchive()
@@ -0,0 +1,236 @@
+"""
+Batch translation of exam questions through the local gemma3n model.
+
+Every translated string is stored in a persistent SQLite cache keyed by
+(hash of the English text, language), so a question is translated once, either
+ahead of time by pretranslate_banks.py or by the background worker the first
+time it is requested, and served from the cache afterwards.
+"""
+
+import hashlib
+import json
+import os
+import queue
+import re
+import sqlite3
+import threading
+
+from backend.llm_scheduler import BACKGROUND, INTERACTIVE
+from backend.mcq_generator import ollama_generate
+
+TRANSLATION_CACHE_DB = os.path.join(os.path.dirname(__file__), "translation_cache.sqlite")
+SOURCE_LANGUAGE = "en"
+LANGUAGE_NAMES = {
+    "en": "English",
+    "hi": "Hindi",
+}
+# Question fields the clients render; answers reach students only as MCQ options
+TRANSLATED_FIELDS = ("Question", "Topic")
+# Strings per model call; larger batches amortize the prompt but risk truncated JSON
+BATCH_SIZE = 10
+
+_local = threading.local()
+_LATIN = re.compile(r"[A-Za-z]")
+
+_pending = queue.Queue()
+_pending_keys = set()
+_pending_lock = threading.Lock()
+_worker = None
+
+
+def _connection():
+    conn = getattr(_local, "conn", None)
+    if conn is None:
+        conn = _local.conn = sqlite3.connect(TRANSLATION_CACHE_DB, timeout=30)
+        conn.execute("PRAGMA journal_mode=WAL")
+        conn.execute(
+            "CREATE TABLE IF NOT EXISTS translations ("
+            "text_hash TEXT NOT NULL, language TEXT NOT NULL, translated TEXT NOT NULL, "
+            "PRIMARY KEY (text_hash, language))"
+        )
+    return conn
+
+
+def text_hash(text):
+    return hashlib.blake2b(text.encode("utf-8"), digest_size=12).hexdigest()
+
+
+def needs_translation(language):
+    return bool(language) and language.lower() != SOURCE_LANGUAGE
+
+
+def _is_translatable(text):
+    # Strings with no Latin letters are numbers, formulas or already in the
+    # target script; sending them through an English prompt is wasted work
+    return bool(text) and _LATIN.search(text) is not None
+
+
+def _cached(hashes, language):
+    found = {}
+    conn = _connection()
+    # Stay well under SQLite's bound-parameter limit
+    for start in range(0, len(hashes), 500):
+        chunk = hashes[start:start + 500]
+        placeholders = ",".join("?" * len(chunk))
+        rows = conn.execute(
+            f"SELECT text_hash, translated FROM translations WHERE language = ? AND text_hash IN ({placeholders})",
+            [language] + chunk
+        )
+        found.update(rows)
+    return found
+
+
+def _store(pairs, language):
+    conn = _connection()
+    with conn:
+        conn.executemany(
+            "INSERT OR REPLACE INTO translations (text_hash, language, translated) VALUES (?, ?, ?)",
+            [(h, language, translated) for h, translated in pairs]
+        )
+
+
+def _translate_batch(texts, language, priority, user_id):
+    """
+    Translates a batch of strings in one model call. Returns None if the model
+    reply cannot be parsed into the same number of strings.
+    """
+    name = LANGUAGE_NAMES.get(language, language)
+    prompt = (
+        f"Translate each string in the following JSON array from English to {name}. "
+        f"Keep chemical formulas, equations, symbols, units and numbers unchanged. "
+        f"Return ONLY a JSON array of exactly {len(texts)} translated strings, in the same order. "
+        f"Do not include any explanation or text outside the JSON.\n"
+        f"{json.dumps(texts, ensure_ascii=False)}"
+    )
+    try:
+        text = ollama_generate(prompt, timeout=120, priority=priority, user_id=user_id)
+        match = re.search(r"\[.*\]", text, re.DOTALL)
+        if not match:
+            return None
+        translated = json.loads(match.group(0))
+        if len(translated) != len(texts) or not all(isinstance(t, str) for t in translated):
+            return None
+        return translated
+    except Exception as e:
+        with open("ollama_mcq_debug.log", "a", encoding="utf-8") as f:
+            f.write(f"\nTRANSLATION ERROR ({language}): {str(e)}\n")
+        return None
+
+
+def _background_worker():
+    while True:
+        language, text = _pending.get()
+        batch = [text]
+        # Group whatever else is already waiting for the same language into one call
+        while len(batch) < BATCH_SIZE:
+            try:
+                item = _pending.get_nowait()
+            except queue.Empty:
+                break
+            if item[0] == language:
+                batch.append(item[1])
+            else:
+                _pending.put(item)
+                break
+        try:
+            translate_texts(batch, language, priority=BACKGROUND)
+        except Exception as e:
+            with open("ollama_mcq_debug.log", "a", encoding="utf-8") as f:
+                f.write(f"\nBACKGROUND TRANSLATION ERROR ({language}): {str(e)}\n")
+        finally:
+            with _pending_lock:
+                for t in batch:
+                    _pending_keys.discard((language, t))
+
+
+def queue_translation(texts, language):
+    """
+    Schedules strings for background translation into the cache, without waiting.
+    """
+    global _worker
+    with _pending_lock:
+        if _worker is None:
+            _worker = threading.Thread(target=_background_worker, name="translation-worker", daemon=True)
+            _worker.start()
+        for t in texts:
+            if (language, t) not in _pending_keys:
+                _pending_keys.add((language, t))
+                _pending.put((language, t))
+
+
+def translate_texts(texts, language, priority=INTERACTIVE, user_id=None, wait=True):
+    """
+    Translates a list of strings, serving cached translations first and sending
+    the rest to the model in batches. Strings that fail to translate are returned
+    unchanged (and not cached, so a later call retries them).
+    With wait=False, cache misses are returned unchanged and handed to the
+    background worker instead, so the caller never waits on the model.
+    """
+    if not needs_translation(language):
+        return list(texts)
+    language = language.lower()
+    unique = {}
+    for t in texts:
+        if _is_translatable(t) and t not in unique:
+            unique[t] = text_hash(t)
+    translations = _cached(list(unique.values()), language)
+    missing = [t for t, h in unique.items() if h not in translations]
+    if not wait:
+        if missing:
+            queue_translation(missing, language)
+        missing = []
+    for start in range(0, len(missing), BATCH_SIZE):
+        batch = missing[start:start + BATCH_SIZE]
+        translated = _translate_batch(batch, language, priority, user_id)
+        if translated is None:
+            continue
+        pairs = [(unique[t], tr) for t, tr in zip(batch, translated)]
+        _store(pairs, language)
+        translations.update(pairs)
+    return [translations.get(unique.get(t), t) if t else t for t in texts]
+
+
+def translate_questions(questions, language, fields=TRANSLATED_FIELDS, user_id=None, wait=True):
+    """
+    Returns copies of the question dicts with the given text fields translated.
+    """
+    if not needs_translation(language):
+        return questions
+    slots = []
+    texts = []
+    for i, q in enumerate(questions):
+        for field in fields:
+            value = q.get(field)
+            if isinstance(value, str) and value:
+                slots.append((i, field))
+                texts.append(value)
+    translated = translate_texts(texts, language, user_id=user_id, wait=wait)
+    result = [dict(q) for q in questions]
+    for (i, field), value in zip(slots, translated):
+        result[i][field] = value
+    return result
+
+
+def translate_mcqs(mcqs, language, user_id=None):
+    """
+    Returns copies of MCQs generated from the English originals with the question
+    text and options translated, all in one batched pass. subject and topic stay
+    in English so analytics keys don't depend on the exam language.
+    """
+    if not needs_translation(language):
+        return mcqs
+    texts = []
+    for mcq in mcqs:
+        texts.append(mcq.get("question") if isinstance(mcq.get("question"), str) else "")
+        texts.extend(opt for opt in (mcq.get("options") or []) if isinstance(opt, str))
+    translated = iter(translate_texts(texts, language, user_id=user_id))
+    result = []
+    for mcq in mcqs:
+        mcq = dict(mcq)
+        question = next(translated)
+        if question:
+            mcq["question"] = question
+        if mcq.get("options"):
+            mcq["options"] = [next(translated) if isinstance(opt, str) else opt for opt in mcq["options"]]
+        result.append(mcq)
+    return result
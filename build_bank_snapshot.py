@@ -0,0 +1,19 @@
+import os
+from backend.bank_snapshot import build_snapshot
+from backend.question_bank import DB_CONFIG, SNAPSHOT_PATH, get_columns, query
+
+# Run after convert_csv_to_sqlite.py to rebuild the memory-mapped snapshot the
+# backend workers load at startup (see backend/bank_snapshot.py).
+
+tables = []
+for subject, grade, db_path, table in DB_CONFIG:
+    if not os.path.exists(db_path):
+        print(f"DB missing: {db_path}")
+        continue
+    columns = get_columns(db_path, table)
+    rows = query(db_path, f"SELECT * FROM {table}")
+    print(f"Indexed {db_path} (table: {table}): {len(rows)} rows")
+    tables.append((subject, grade, db_path, table, columns, rows))
+
+build_snapshot(SNAPSHOT_PATH, tables)
+print(f"Wrote {SNAPSHOT_PATH} ({os.path.getsize(SNAPSHOT_PATH)} bytes)")
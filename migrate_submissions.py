@@ -0,0 +1,65 @@
+import argparse
+import json
+import os
+from backend.submission_store import SUBMISSIONS_DIR, archive, build_questions_with_answers, decode_record, encode_record
+
+# Moves the legacy per-submission JSON files in backend/submissions into the
+# compact segment archive (see backend/submission_store.py).
+
+def matches(submission, questions, stored_review):
+    return submission["questions"] == questions and submission["questions_with_answers"] == stored_review
+
+def migrate(delete=False):
+    if not os.path.exists(SUBMISSIONS_DIR):
+        print(f"Directory not found: {SUBMISSIONS_DIR}")
+        return
+    files = sorted(f for f in os.listdir(SUBMISSIONS_DIR) if f.endswith(".json"))
+    migrated = skipped = 0
+    for fname in files:
+        fpath = os.path.join(SUBMISSIONS_DIR, fname)
+        with open(fpath, "r", encoding="utf-8") as f:
+            data = json.load(f)
+        questions = data.get("questions") or []
+        answers = data.get("answers") or {}
+        stored_review = data.get("questions_with_answers", [])
+        if fname in archive:
+            skipped += 1
+        else:
+            # Only keep the stored review rows if they differ from what the
+            # archive would rebuild (e.g. files written by older code)
+            extra_review = None if build_questions_with_answers(questions, answers) == stored_review else stored_review
+            # Check the encoded record in memory first, so a lossy one never
+            # reaches the archive, where it would shadow the original
+            decoded = decode_record(encode_record({"questions": questions, "answers": answers, "review": extra_review}))
+            review = decoded["review"]
+            if review is None:
+                review = build_questions_with_answers(decoded["questions"], decoded["answers"])
+            if not matches({"questions": decoded["questions"], "questions_with_answers": review}, questions, stored_review):
+                print(f"Round-trip mismatch, not archived: {fname}")
+                continue
+            archive.append(fname, {
+                "user_id": data.get("user_id"),
+                "exam_id": data.get("exam_id"),
+                "answers": answers,
+                "questions": questions,
+                "score": data.get("score"),
+                "correct": data.get("correct"),
+                "total": data.get("total"),
+                "filters": data.get("filters", {}),
+                "submitted_at": data.get("submitted_at"),
+            }, questions_with_answers=extra_review)
+            migrated += 1
+            print(f"Archived {fname}")
+        # Verify what the server will actually read before touching the original
+        if not matches(archive.load(fname), questions, stored_review):
+            print(f"Archived copy differs, keeping original: {fname}")
+            continue
+        if delete:
+            os.remove(fpath)
+    print(f"Migrated {migrated} submissions ({skipped} already archived).")
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Migrate JSON submissions into the submission archive.")
+    parser.add_argument("--delete", action="store_true", help="Remove each JSON file once it is archived.")
+    args = parser.parse_args()
+    migrate(delete=args.delete)
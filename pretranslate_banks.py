@@ -0,0 +1,29 @@
+import argparse
+from backend.question_bank import DB_CONFIG, fetch_rows
+from backend.llm_scheduler import BACKGROUND
+from backend.translation import BATCH_SIZE, LANGUAGE_NAMES, TRANSLATED_FIELDS, translate_texts
+
+# Fills the translation cache for the question banks ahead of time, so
+# /generate_exam serves translated questions without calling the model.
+
+def pretranslate(language, difficulty=None):
+    for subject, grade, db_path, table in DB_CONFIG:
+        try:
+            rows = fetch_rows(db_path, table, difficulty=difficulty)
+        except FileNotFoundError:
+            print(f"DB missing: {db_path}")
+            continue
+        texts = [row[field] for row in rows for field in TRANSLATED_FIELDS if row.get(field)]
+        print(f"Translating {subject} {grade}: {len(texts)} strings -> {LANGUAGE_NAMES.get(language, language)}")
+        # Cached strings are skipped inside translate_texts; chunking only bounds memory and reports progress
+        chunk = BATCH_SIZE * 20
+        for start in range(0, len(texts), chunk):
+            translate_texts(texts[start:start + chunk], language, priority=BACKGROUND)
+            print(f"  {min(start + chunk, len(texts))}/{len(texts)}")
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Pre-translate the SQLite question banks into the translation cache.")
+    parser.add_argument("--language", default="hi", help="Target language code (default: hi)")
+    parser.add_argument("--difficulty", choices=["easy", "medium", "hard"], help="Only translate one difficulty level")
+    args = parser.parse_args()
+    pretranslate(args.language, args.difficulty)